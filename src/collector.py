@@ -2,18 +2,57 @@
 
 import argparse
 import asyncio
-import math
+import gzip
 import os
 import os.path
+import random
 import sys
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import NamedTuple, Optional, Text
 
 import aiofiles
 import aiohttp
-import requests
+import orjson
 from rich.console import Console
 
 from meta import __version__
+from preprocessing.exclusions import get_json_exclusion_reason
+
+# maximum number of simultaneous connections to a single Wikipedia host
+WIKIPEDIA_CONNECTIONS_PER_HOST = 32
+
+# maximum number of article requests in flight, which bounds the number of
+# response bodies held in memory at once
+FETCH_CONCURRENCY = 64
+
+# HTTP response status codes of transient failures that are retried
+RETRY_HTTP_STATUS_CODES = {429, 503, 504}
+# maximum number of attempts of a single GET request
+FETCH_MAX_ATTEMPTS = 5
+# base delay in seconds of the exponential backoff between attempts
+RETRY_BACKOFF_BASE = 0.5
+# maximum delay in seconds between attempts, which bounds the time a retried
+# request holds one of the FETCH_CONCURRENCY slots
+RETRY_MAX_DELAY = 60
+
+# MediaWiki API parse action parameters shared by all article content requests.
+# The article `pageid` parameter is added per request.  The response is limited
+# to the `parse.text` HTML, without the parser limit report HTML comment and the
+# section edit links that are not used in the <p> tag content.
+WIKI_CONTENT_PARAMS = {
+    "action": "parse",
+    "format": "json",
+    "curtimestamp": "1",
+    "uselang": "content",
+    "prop": "text",
+    "disablelimitreport": "1",
+    "disableeditsection": "1",
+    "formatversion": "2",
+}
+
+# ClientSession shared across all requests in a collection run, see _get_session
+_session = None
 
 
 class MLRes(NamedTuple):
@@ -22,47 +61,142 @@ class MLRes(NamedTuple):
     filepath: Optional[Text]
     http_status: int
     write_success: bool
+    excluded_reason: Optional[Text]
 
 
-def _get_filepath(params_dict, dirpath):
-    """Returns filepath from base file name in URL and directory path."""
-    filename = f"{params_dict['pageid']}.json"
+def _get_wiki_api_url(lang):
+    """Returns the MediaWiki API URL of the `lang` language Wikipedia."""
+    return f"https://{lang}.wikipedia.org/w/api.php"
+
+
+def _get_filepath(params_dict, dirpath, gzipped):
+    """Returns filepath from base file name in URL and directory path.  Gzip
+    compressed files take a `.json.gz` extension."""
+    if gzipped:
+        filename = f"{params_dict['pageid']}.json.gz"
+    else:
+        filename = f"{params_dict['pageid']}.json"
     return os.path.join(dirpath, filename)
 
 
+def _decompress(content, gzipped):
+    """Returns the decompressed response body bytes `content`."""
+    if gzipped:
+        return gzip.decompress(content)
+    return content
+
+
+def _get_content_exclusion_reason(content, gzipped, lang):
+    """Returns the exclusion criterion that the article in the response body bytes
+    `content` meets (None if the article meets the inclusion criteria)."""
+    return get_json_exclusion_reason(_decompress(content, gzipped), lang)
+
+
+async def _get_session():
+    """Returns the module-level aiohttp ClientSession, instantiated on first use.
+    The session connection pool keeps TCP + TLS connections alive and caches
+    DNS lookups so that these costs are shared across all article requests.
+    Gzip compressed response bodies are requested and are not decompressed by
+    aiohttp so that they can be written to disk as received."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=WIKIPEDIA_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=300,
+                keepalive_timeout=75,
+            ),
+            headers={"Accept-Encoding": "gzip"},
+            auto_decompress=False,
+        )
+    return _session
+
+
+def _get_retry_delay(retry_after, attempt):
+    """Returns the delay in seconds before the next attempt of a request that
+    failed on attempt number `attempt` (zero-based).  A `retry_after` Retry-After
+    response header value in delay-seconds or HTTP-date form takes precedence
+    over the exponential backoff.  Random jitter is added in both cases, and the
+    delay is capped at RETRY_MAX_DELAY."""
+    backoff = RETRY_BACKOFF_BASE * 2**attempt
+    jitter = random.uniform(0, backoff)
+    if retry_after is not None:
+        if retry_after.isdigit():
+            return min(int(retry_after) + jitter, RETRY_MAX_DELAY)
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            retry_at = None
+        if retry_at is not None and retry_at.tzinfo is not None:
+            now = datetime.now(timezone.utc)
+            delay = max(0.0, (retry_at - now).total_seconds()) + jitter
+            return min(delay, RETRY_MAX_DELAY)
+
+    return min(backoff + jitter, RETRY_MAX_DELAY)
+
+
+async def async_get(session, url, params):
+    """Asynchronous I/O HTTP GET request with a ClientSession instantiated
+    from the aiohttp library.  Responses with a transient failure status code
+    in RETRY_HTTP_STATUS_CODES are retried with a jittered exponential backoff
+    up to FETCH_MAX_ATTEMPTS attempts.
+    :returns tuple with http_status, the undecoded response body bytes (None for
+    non-200 responses), and whether the body is gzip compressed"""
+    for attempt in range(FETCH_MAX_ATTEMPTS):
+        async with session.get(url, params=params) as response:
+            status = response.status
+            gzipped = response.headers.get("Content-Encoding") == "gzip"
+            if status == 200:
+                return status, await response.read(), gzipped
+            elif (
+                status not in RETRY_HTTP_STATUS_CODES
+                or attempt == FETCH_MAX_ATTEMPTS - 1
+            ):
+                return status, None, gzipped
+            delay = _get_retry_delay(response.headers.get("Retry-After"), attempt)
+        await asyncio.sleep(delay)
+
+
 async def async_fetch(session, url):
     """Asynchronous I/O HTTP GET request with a ClientSession instantiated
-    from the aiohttp library."""
+    from the aiohttp library.  The response body is returned as undecoded and,
+    if the server applied gzip content encoding, compressed bytes."""
     api_url = url[0]
     params = url[1]
-    async with session.get(api_url, params=params) as response:
-        status = response.status
-        if status != 200:
-            text = None
-        else:
-            text = await response.text(encoding="utf-8")
-        return api_url, params, status, text
+    status, content, gzipped = await async_get(session, api_url, params)
+    return api_url, params, status, content, gzipped
 
 
-async def async_write_text(path, text):
-    """Asynchronous IO writes of text data `text` to disk on the file path `path`"""
-    async with aiofiles.open(path, "w", encoding="utf-8") as f:
-        await f.write(text)
+async def async_write_bytes(path, content):
+    """Asynchronous IO writes of binary data `content` to disk on the file path
+    `path` with a single binary write."""
+    async with aiofiles.open(path, "wb") as f:
+        await f.write(content)
 
 
-async def async_fetch_and_write(session, url, dirpath):
+async def async_fetch_and_write(session, url, dirpath, lang):
     """Asynchronous I/O HTTP GET request with a ClientSession instantiated
     from the aiohttp library, followed by an asynchronous I/O file write of
-    the binary to disk with the aiofiles library.
-    :returns tuple with url, filepath, http_status, write_success items"""
-    url, params, status, text = await async_fetch(session, url)
-    if status != 200:
-        filepath = None
-        write_success = False
-    else:
-        filepath = _get_filepath(params, dirpath)
-        await async_write_text(filepath, text)
-        write_success = True
+    the binary to disk with the aiofiles library.  Articles that meet the
+    `lang` language exclusion criteria are not written to disk.  Gzip compressed
+    responses are written to disk compressed.  The CPU-bound exclusion criteria
+    checks run in the event loop default executor.
+    :returns tuple with url, filepath, http_status, write_success,
+    excluded_reason items"""
+    url, params, status, content, gzipped = await async_fetch(session, url)
+    filepath = None
+    write_success = False
+    excluded_reason = None
+    if status == 200:
+        loop = asyncio.get_running_loop()
+        excluded_reason = await loop.run_in_executor(
+            None, _get_content_exclusion_reason, content, gzipped, lang
+        )
+        if excluded_reason is None:
+            filepath = _get_filepath(params, dirpath, gzipped)
+            await async_write_bytes(filepath, content)
+            write_success = True
 
     return MLRes(
         url=url,
@@ -70,47 +204,90 @@ async def async_fetch_and_write(session, url, dirpath):
         filepath=filepath,
         http_status=status,
         write_success=write_success,
+        excluded_reason=excluded_reason,
     )
 
 
-async def create_async_get_request_session_and_run(urls, dirpath):
-    """Creates an aiohttp library ClientSession and performs asynchronous GET requests +
-    binary file writes with the binary response from the GET request.
-    :returns list of asyncio Tasks that include tuples of response data
-    (defined in async_fetch_and_write)"""
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for url in urls:
-            # use asyncio.ensure_future instead of .run() here to maintain
-            # Py3.6 compatibility
-            task = asyncio.ensure_future(async_fetch_and_write(session, url, dirpath))
-            tasks.append(task)
-        await asyncio.gather(*tasks, return_exceptions=True)
-        return tasks
-
-
-def async_fetch_files(dirpath, urls):
-    """Main entry point for the asynchronous GET requests for text files"""
+async def create_async_get_request_session_and_run(session, urls, dirpath, lang):
+    """Performs asynchronous GET requests + binary file writes with the binary
+    response from the GET request on the caller-owned aiohttp ClientSession `session`.
+    At most FETCH_CONCURRENCY requests are in flight at once.
+    :returns list of tuples of response data (defined in async_fetch_and_write)
+    or of the exceptions raised by the requests, in order of completion"""
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def bounded_fetch_and_write(url):
+        async with semaphore:
+            return await async_fetch_and_write(session, url, dirpath, lang)
+
+    results = []
+    for future in asyncio.as_completed([bounded_fetch_and_write(url) for url in urls]):
+        try:
+            results.append(await future)
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+async def async_run_session(lang, chunked_article_numbers, dirpath):
+    """Runs the random article ID requests and the article content GET requests
+    on the shared ClientSession and closes the session when all requests are
+    complete."""
+    async with await _get_session() as session:
+        random_list = []
+        for chunk_number in chunked_article_numbers:
+            random_list.extend(
+                await get_random_wikipedia_article_ids_by_lang(
+                    session, lang, chunk_number
+                )
+            )
+
+        # collect random articles with unique API id's into a dictionary
+        article_dict = {}
+        for item in random_list:
+            article_dict[item["id"]] = {"title": item["title"]}
+
+        # prep GET request URLs (including API params)
+        url_list = generate_content_url_list(lang, article_dict)
+
+        # go get them with async GET requests + async writes
+        return await create_async_get_request_session_and_run(
+            session, url_list, dirpath, lang
+        )
+
+
+def async_fetch_files(lang, chunked_article_numbers, dirpath):
+    """Main entry point for the asynchronous GET requests for text files
+    :returns tuple with the number of articles written to disk and the number of
+    articles that met exclusion criteria and were not written"""
     loop = asyncio.get_event_loop()
-    tasks = loop.run_until_complete(
-        create_async_get_request_session_and_run(urls, dirpath)
+    results = loop.run_until_complete(
+        async_run_session(lang, chunked_article_numbers, dirpath)
     )
-    for task in tasks:
-        if task.exception():
+    written_count = 0
+    excluded_count = 0
+    for result in results:
+        if isinstance(result, Exception):
             # raise exception here to notify calling code that something
             # did not work
-            raise AIOError(f"{task.exception()}")
-        elif task.result().http_status != 200:
+            raise AIOError(f"{result}")
+        elif result.http_status != 200:
             # handle non-200 HTTP response status codes + file write fails
             raise AIOError(
-                f"failed to pull '{task.result().url}' with ID "
-                f"{task.result().params['pageid']}: HTTP status "
-                f"code {task.result().http_status}"
+                f"failed to pull '{result.url}' with ID "
+                f"{result.params['pageid']}: HTTP status "
+                f"code {result.http_status}"
             )
+        if result.write_success:
+            written_count += 1
+        if result.excluded_reason is not None:
+            excluded_count += 1
 
+    return written_count, excluded_count
 
-def get_random_wikipedia_article_ids_by_lang(lang, request_number):
-    wiki_api_url = f"https://{lang}.wikipedia.org/w/api.php"
+
+async def get_random_wikipedia_article_ids_by_lang(session, lang, request_number):
+    wiki_api_url = _get_wiki_api_url(lang)
     params_randomizer = {
         "format": "json",
         "action": "query",
@@ -118,55 +295,31 @@ def get_random_wikipedia_article_ids_by_lang(lang, request_number):
         "rnnamespace": "0",
         "prop": "revisions",
         "rvprop": "content",
-        "rnlimit": f"{request_number}",
+        "rnlimit": str(request_number),
     }
 
-    res = requests.get(wiki_api_url, params_randomizer)
-    if res.status_code == 200:
-        json_res_random = res.json()
-        return json_res_random["query"]["random"]
-    else:
-        sys.stderr.write(f"Failed with HTTP status code: {res.status_code}\n")
-        sys.exit(1)
+    status, content, gzipped = await async_get(session, wiki_api_url, params_randomizer)
+    if status != 200:
+        raise AIOError(f"failed to pull random article IDs: HTTP status code {status}")
+    json_res_random = orjson.loads(_decompress(content, gzipped))
+    return json_res_random["query"]["random"]
 
 
 def generate_content_url_list(lang, random_article_id_dict):
-    url_list = []
-    wiki_api_url = f"https://{lang}.wikipedia.org/w/api.php"
-
-    for key, _ in random_article_id_dict.items():
-        params_content = {
-            "action": "parse",
-            "format": "json",
-            "curtimestamp": "1",
-            "uselang": "content",
-            "prop": "text",
-            "formatversion": "2",
-            "pageid": f"{key}",
-        }
-        url_list.append((wiki_api_url, params_content))
-
-    return url_list
+    wiki_api_url = _get_wiki_api_url(lang)
+    return [
+        (wiki_api_url, {**WIKI_CONTENT_PARAMS, "pageid": f"{key}"})
+        for key in random_article_id_dict
+    ]
 
 
 def chunk(total, chunksize):
-    # if the chunk size exceeds total request
-    # return the total request size as this
-    # is an appropriate chunk
-    if chunksize > total:
-        return [total]
-
-    # otherwise establish number of chunksize
-    # chunks for requests
-    factor = math.floor(total / chunksize)
-    modulo = total % chunksize
-    product = factor * chunksize
-    # add `factor` number of chunks
-    chunk_list = [f"{chunksize}"] * factor
-    if modulo > 0:
-        chunk_list.append(f"{total - product}")
-
-    return chunk_list
+    """Returns a list of integer request sizes of at most `chunksize` that sum
+    to `total`."""
+    factor, modulo = divmod(total, chunksize)
+    # add `factor` number of chunks and the remainder, or return the
+    # total request size if it is smaller than a single chunk
+    return [chunksize] * factor + ([modulo] if modulo else []) or [total]
 
 
 class AIOError(Exception):
@@ -195,7 +348,6 @@ def main(argv):
         spinner="dots10",
     ):
         try:
-            random_list = []
             # maximum number of random article requests defined by
             # the wikipedia API
             wikipedia_max = 500
@@ -207,21 +359,12 @@ def main(argv):
                     f"Chunking random article requests @ API max: "
                     f"{chunked_article_numbers}"
                 )
-            for chunk_number in chunked_article_numbers:
-                random_list.extend(
-                    get_random_wikipedia_article_ids_by_lang(args.LANG, chunk_number)
-                )
 
-            # collect random articles with unique API id's into a dictionary
-            article_dict = {}
-            for item in random_list:
-                article_dict[item["id"]] = {"title": item["title"]}
-
-            # prep GET request URLs (including API params)
-            url_list = generate_content_url_list(args.LANG, article_dict)
-
-            # go get them with async GET requests + async writes
-            async_fetch_files(args.TARGETDIR, url_list)
+            # go get random article IDs and then the article content with
+            # async GET requests + async writes
+            written_count, excluded_count = async_fetch_files(
+                args.LANG, chunked_article_numbers, args.TARGETDIR
+            )
         except Exception as e:
             sys.stderr.write(
                 f"Failed attempt to pull randomized data with error: {e}\n"
@@ -232,12 +375,11 @@ def main(argv):
         f"Pulled articles from `{args.LANG}` Wikipedia to directory path ==> "
         f"[blue underline]{args.TARGETDIR}[/blue underline]"
     )
-    json_file_count = len(
-        [name for name in os.listdir(args.TARGETDIR) if name.endswith(".json")]
-    )
+    if excluded_count > 0:
+        console.print(f"Skipped {excluded_count} articles that met exclusion criteria")
     console.print(
-        f"Total JSON files in [blue underline]{args.TARGETDIR}[/blue underline] ==> "
-        f"{json_file_count}"
+        f"Total JSON files written to [blue underline]{args.TARGETDIR}"
+        f"[/blue underline] ==> {written_count}"
     )
     console.log("End Collection")
 
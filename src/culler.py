@@ -2,61 +2,51 @@
 
 import argparse
 import asyncio
-import json
+import gzip
+import itertools
+import math
+import mmap
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import aiofiles
-from bs4 import BeautifulSoup
 from rich.console import Console
 
 from meta import __version__
-from parsers.html import parse_html_p_content
-from preprocessing.cleaners import clean_wikipedia
-from utils.strutils import utf8len
-
-# tuple of localized `title` attribute defintions in Wikipedia stub
-# article HTML `a href` tags
-WIKI_STUB_TITLES = {
-    "en": "Wikipedia:Stub",  # English
-    "he": "ויקיפדיה:קצרמר",  # Hebrew
-}
-
-
-async def async_read(filepath):
-    """Asynchronous IO text file reads"""
-    async with aiofiles.open(filepath, "r") as f:
-        return await f.read()
-
-
-# ==================
-# Exclusion criteria
-# ==================
-
-
-async def is_exclusion_stub(html_text, lang_tag):
-    if lang_tag in WIKI_STUB_TITLES:
-        soup = BeautifulSoup(html_text, "lxml")
-        stub_title = WIKI_STUB_TITLES[lang_tag]
-        # if we identify the stub HTML tag, it is a stub
-        if soup.find("a", {"title": stub_title}):
-            return True
-
-    return False
-
-
-def is_exclusion_empty_content(parsed_p_tag_content):
-    return parsed_p_tag_content is None
-
-
-def is_exclusion_content_size(parsed_p_tag_content):
-    """Exclude articles below a content size threshold.
-    Defined at the 25th percentile of English article sizes."""
-    if utf8len(clean_wikipedia(parsed_p_tag_content)) < 579:
-        return True
-    else:
-        return False
+from preprocessing.exclusions import (
+    EXCLUSION_API_ERROR,
+    EXCLUSION_CONTENT_SIZE,
+    EXCLUSION_EMPTY_CONTENT,
+    EXCLUSION_STUB,
+    get_json_exclusion_reason,
+)
+
+# maximum number of files classified in a single ProcessPoolExecutor job
+CLASSIFY_CHUNK_SIZE = 256
+
+
+def classify_file(filepath, lang_tag):
+    """Memory maps the JSON file on path `filepath` and returns a tuple with the file
+    path and the exclusion criterion that the article meets (None if the article
+    meets the inclusion criteria).  Gzip compressed `.json.gz` files are
+    decompressed from the memory map.  Runs in ProcessPoolExecutor worker
+    processes."""
+    with open(filepath, "rb") as f:
+        # empty files cannot be memory mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return filepath, get_json_exclusion_reason(f.read(), lang_tag)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as json_bytes:
+            if str(filepath).endswith(".gz"):
+                return filepath, get_json_exclusion_reason(
+                    gzip.decompress(json_bytes), lang_tag
+                )
+            return filepath, get_json_exclusion_reason(json_bytes, lang_tag)
+
+
+def classify_files(filepaths, lang_tag):
+    """Returns a list of classify_file tuples for the file paths `filepaths`"""
+    return [classify_file(filepath, lang_tag) for filepath in filepaths]
 
 
 # ==================
@@ -64,41 +54,76 @@ def is_exclusion_content_size(parsed_p_tag_content):
 # ==================
 
 
-async def remove_file(filepath):
-    """Asynchronous removal of file on path `filepath`"""
+def remove_file(filepath):
+    """Removal of file on path `filepath`"""
     os.remove(filepath)
 
 
-async def remove_files(filepaths, lang_tag):
-    """Asynchronous file removal based on inclusion/exclusion criteria."""
+def remove_file_batch(filepaths):
+    """Removal of files on paths `filepaths`.  Where the platform supports it,
+    files are unlinked relative to an open file descriptor of their parent
+    directory so that the directory path is resolved once per directory
+    instead of once per file."""
+    if os.unlink not in os.supports_dir_fd:
+        for filepath in filepaths:
+            remove_file(filepath)
+        return
+
+    dir_filenames = {}
+    for filepath in filepaths:
+        dirpath, filename = os.path.split(filepath)
+        dir_filenames.setdefault(dirpath, []).append(filename)
+
+    for dirpath, filenames in dir_filenames.items():
+        dir_fd = os.open(dirpath or os.curdir, os.O_RDONLY)
+        try:
+            for filename in filenames:
+                os.unlink(filename, dir_fd=dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+async def remove_files(filepaths, lang_tag, executor):
+    """Asynchronous file removal based on inclusion/exclusion criteria.  The
+    CPU-bound file classification is distributed across the `executor` worker
+    processes in chunks of file paths."""
     remove_path_list = []
     stub_file_count = 0
     empty_content_count = 0
     below_content_size_count = 0
+    api_error_count = 0
+
+    # chunk the file paths so that each job amortizes the inter-process
+    # communication over many files while leaving several jobs per worker
+    chunksize = math.ceil(len(filepaths) / (4 * (os.cpu_count() or 1)))
+    chunksize = max(1, min(chunksize, CLASSIFY_CHUNK_SIZE))
+    filepath_chunks = [
+        filepaths[i : i + chunksize] for i in range(0, len(filepaths), chunksize)
+    ]
+
+    loop = asyncio.get_running_loop()
+    classified_chunks = await asyncio.gather(
+        *[
+            loop.run_in_executor(executor, classify_files, filepath_chunk, lang_tag)
+            for filepath_chunk in filepath_chunks
+        ]
+    )
+    for filepath, exclusion_reason in itertools.chain.from_iterable(classified_chunks):
+        if exclusion_reason is None:
+            continue
 
-    for filepath in filepaths:
-        json_text = await async_read(filepath)
-        json_obj = json.loads(json_text)
-        html_text = json_obj["parse"]["text"]
-        # exclusion criterion: Is a stub file
-        if await is_exclusion_stub(html_text, lang_tag):
-            remove_path_list.append(filepath)
+        remove_path_list.append(filepath)
+        if exclusion_reason == EXCLUSION_STUB:
             stub_file_count += 1
-        else:
-            parsed_p_tag_content = parse_html_p_content(html_text)
-            if is_exclusion_empty_content(parsed_p_tag_content):
-                remove_path_list.append(filepath)
-                empty_content_count += 1
-            # the above check confirms that the parsed <p> tag content
-            # response is not None.  Keep this check below (also because
-            # this is likely slower)
-            elif is_exclusion_content_size(parsed_p_tag_content):
-                remove_path_list.append(filepath)
-                below_content_size_count += 1
+        elif exclusion_reason == EXCLUSION_EMPTY_CONTENT:
+            empty_content_count += 1
+        elif exclusion_reason == EXCLUSION_CONTENT_SIZE:
+            below_content_size_count += 1
+        elif exclusion_reason == EXCLUSION_API_ERROR:
+            api_error_count += 1
 
     # remove files that meet exclusion criteria
-    for remove_filepath in remove_path_list:
-        await remove_file(remove_filepath)
+    remove_file_batch(remove_path_list)
 
     # report number of articles that met exclusion criteria
     if stub_file_count > 0:
@@ -110,14 +135,25 @@ async def remove_files(filepaths, lang_tag):
             f"Removed {below_content_size_count} articles below content "
             f"size criterion"
         )
-    removed_file_count = stub_file_count + empty_content_count + below_content_size_count
+    if api_error_count > 0:
+        print(f"Removed {api_error_count} API error responses")
+    removed_file_count = (
+        stub_file_count
+        + empty_content_count
+        + below_content_size_count
+        + api_error_count
+    )
     return removed_file_count
 
 
 def cull(filepaths, lang_tag):
     """Asynchronous file removal based on inclusion/exclusion criteria"""
     loop = asyncio.get_event_loop()
-    removed_file_count = loop.run_until_complete(remove_files(filepaths, lang_tag))
+    # the default ProcessPoolExecutor worker count is the number of processors
+    with ProcessPoolExecutor() as executor:
+        removed_file_count = loop.run_until_complete(
+            remove_files(filepaths, lang_tag, executor)
+        )
     return removed_file_count
 
 
@@ -147,8 +183,10 @@ def main(argv):
         "Processing...",
         spinner="dots10",
     ):
-        # Defined as JSON filepaths in the directory that was requested by user
+        # Defined as JSON and gzip compressed JSON filepaths in the directory
+        # that was requested by user
         filepaths = list(Path(args.TARGETDIR).glob("*.json"))
+        filepaths.extend(Path(args.TARGETDIR).glob("*.json.gz"))
         start_filepath_count = len(filepaths)
         console.print(f"Start file count: {start_filepath_count}")
 
@@ -156,7 +194,7 @@ def main(argv):
         removed_file_count = cull(filepaths, args.LANGTAG)
 
         # file removal report
-        remaining_files = len(list(Path(args.TARGETDIR).glob("*.json")))
+        remaining_files = start_filepath_count - removed_file_count
         console.print(f"Remaining file count: {remaining_files}")
         if removed_file_count > 0:
             console.print(
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
 
-def vocabulary_size(tokens):
+def vocabulary_size(tokens, token_types=None):
     """Returns the vocabulary size count defined as the number of alphabetic
     characters as defined by the Python str.isalpha method. This is a
-    case-sensitive count. `tokens` is a list of token strings."""
-    vocab_list = set(token for token in tokens if token.isalpha())
-    return len(vocab_list)
+    case-sensitive count. `tokens` is a list of token strings. `token_types`
+    is an optional precomputed set of the unique token strings in `tokens`."""
+    if token_types is None:
+        token_types = set(tokens)
+    return sum(1 for token in token_types if token.isalpha())
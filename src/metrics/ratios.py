@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
 
-def lexical_diversity(tokens):
+def lexical_diversity(tokens, token_types=None):
     """Returns a *case-sensitive* lexical diversity measure.  We want to keep case forms
     of the same word as these are considered different tokens in this corpus. `tokens`
-    is a list of token strings."""
-    return len(set(tokens)) / len(tokens)
+    is a list of token strings. `token_types` is an optional precomputed set of the
+    unique token strings in `tokens`."""
+    if token_types is None:
+        token_types = set(tokens)
+    return len(token_types) / len(tokens)
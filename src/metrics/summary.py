@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+
+from metrics.counts import vocabulary_size
+from metrics.ratios import lexical_diversity
+
+
+def token_metrics(tokens):
+    """Returns a tuple of the vocabulary size and the lexical diversity of `tokens`,
+    a list of token strings.  The set of unique tokens is built once and shared by
+    both metrics."""
+    token_types = set(tokens)
+    return (
+        vocabulary_size(tokens, token_types),
+        lexical_diversity(tokens, token_types),
+    )
@@ -1,16 +1,21 @@
 #!/usr/bin/env python3
 
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml.etree import ParserError
 
 
 def parse_html_p_content(html_text):
     """Parses HTML <p> tag text content and returns as
     a newline-delimited concatenated string.  Parsed
-    with BeautifulSoup 4.  Returns either a string or
+    with lxml.  Returns either a string or
     None (no content)"""
-    soup = BeautifulSoup(html_text, "lxml")
-    contents = soup.find_all("p")
+    try:
+        html_tree = lxml.html.fromstring(html_text)
+    except ParserError:
+        # empty document
+        return None
+    contents = html_tree.xpath("//p")
     if len(contents) > 0:
-        return "\n".join([p.text for p in contents])
+        return "\n".join([p.text_content() for p in contents])
     else:
         return None
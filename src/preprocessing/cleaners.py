@@ -1,15 +1,12 @@
 #!/usr/bin/env python3
 import re
 
-WIKI_REF_RE = re.compile(r"\[\d{1,3}\]")
+# Wikipedia editorial strings removed from content in a single pass:
+#   - "[edit]" strings that are used for content editing
+#   - "[citation needed]" editorial strings
+#   - "[\d]" style reference strings
+WIKI_CLEAN_RE = re.compile(r"\[edit\]|\[citation needed\]|\[\d{1,3}\]")
 
 
 def clean_wikipedia(text):
-    # remove "[edit]" strings that are used for content editing
-    cleaned_content = text.replace("[edit]", "")
-    # remove "[\d]" style reference strings
-    cleaned_content = re.sub(WIKI_REF_RE, "", cleaned_content)
-    # remove "[citation neeeded]" editorial strings
-    cleaned_content = cleaned_content.replace("[citation needed]", "")
-
-    return cleaned_content
+    return WIKI_CLEAN_RE.sub("", text)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import json
+
+import orjson
+
+from parsers.html import parse_html_p_content
+from preprocessing.cleaners import clean_wikipedia
+from utils.strutils import utf8len
+
+# tuple of localized `title` attribute defintions in Wikipedia stub
+# article HTML `a href` tags
+WIKI_STUB_TITLES = {
+    "en": "Wikipedia:Stub",  # English
+    "he": "ויקיפדיה:קצרמר",  # Hebrew
+}
+
+# literal `title` attributes of the stub article `a href` tags as they
+# appear in the MediaWiki HTML
+WIKI_STUB_MARKERS = {
+    lang_tag: f'title="{stub_title}"'
+    for lang_tag, stub_title in WIKI_STUB_TITLES.items()
+}
+
+# stub markers as they appear in the undecoded MediaWiki JSON response bytes,
+# with the JSON string escapes of both the UTF-8 and the ASCII encodings of
+# non-ASCII characters
+WIKI_STUB_JSON_MARKERS = {
+    lang_tag: tuple(
+        sorted(
+            {
+                json.dumps(marker, ensure_ascii=ensure_ascii)[1:-1].encode("utf-8")
+                for ensure_ascii in (False, True)
+            }
+        )
+    )
+    for lang_tag, marker in WIKI_STUB_MARKERS.items()
+}
+
+# exclusion criteria names returned by get_json_exclusion_reason
+EXCLUSION_STUB = "stub"
+EXCLUSION_EMPTY_CONTENT = "empty content"
+EXCLUSION_CONTENT_SIZE = "content size"
+EXCLUSION_API_ERROR = "api error"
+
+
+def is_exclusion_stub_json(json_bytes, lang_tag):
+    """Stub articles are identified by a literal search for the stub `a href` tag
+    `title` attribute in the undecoded MediaWiki JSON response bytes `json_bytes`
+    (bytes or mmap).  This does not require a JSON decode or an HTML parse."""
+    if lang_tag in WIKI_STUB_JSON_MARKERS:
+        # if we identify the stub HTML tag, it is a stub.  Use find, mmap
+        # objects do not support subsequence `in` tests
+        for marker in WIKI_STUB_JSON_MARKERS[lang_tag]:
+            if json_bytes.find(marker) != -1:
+                return True
+
+    return False
+
+
+def is_exclusion_empty_content(parsed_p_tag_content):
+    return parsed_p_tag_content is None
+
+
+def is_exclusion_content_size(parsed_p_tag_content):
+    """Exclude articles below a content size threshold.
+    Defined at the 25th percentile of English article sizes."""
+    if utf8len(clean_wikipedia(parsed_p_tag_content)) < 579:
+        return True
+    else:
+        return False
+
+
+def get_content_exclusion_reason(html_text):
+    """Returns the name of the first <p> tag content exclusion criterion that the
+    Wikipedia article HTML `html_text` meets, or None if the article content
+    meets the inclusion criteria."""
+    parsed_p_tag_content = parse_html_p_content(html_text)
+    if is_exclusion_empty_content(parsed_p_tag_content):
+        return EXCLUSION_EMPTY_CONTENT
+    # the above check confirms that the parsed <p> tag content
+    # response is not None.  Keep this check below (also because
+    # this is likely slower)
+    if is_exclusion_content_size(parsed_p_tag_content):
+        return EXCLUSION_CONTENT_SIZE
+
+    return None
+
+
+def get_json_exclusion_reason(json_bytes, lang_tag):
+    """Returns the name of the first exclusion criterion that the Wikipedia
+    article in the MediaWiki parse API JSON response bytes `json_bytes` (bytes or
+    mmap) meets, or None if the article meets the inclusion criteria.  Stub
+    articles are identified before the JSON is decoded.  MediaWiki error
+    responses (e.g. a page that was deleted after the random article ID request)
+    do not include article content and are excluded as API errors."""
+    # exclusion criterion: Is a stub file
+    if is_exclusion_stub_json(json_bytes, lang_tag):
+        return EXCLUSION_STUB
+
+    # orjson decodes from a memoryview of the buffer without a copy
+    with memoryview(json_bytes) as json_view:
+        json_obj = orjson.loads(json_view)
+    if "parse" not in json_obj:
+        return EXCLUSION_API_ERROR
+    return get_content_exclusion_reason(json_obj["parse"]["text"])
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
-import json
+import gzip
 import sys
 
+import orjson
+
 from meta import __version__
 from parsers.html import parse_html_p_content
 from preprocessing.cleaners import clean_wikipedia
@@ -18,9 +20,12 @@ def main(argv):
     args = parser.parse_args(argv)
 
     for json_path in args.FILEPATH:
-        with open(json_path, "r") as f:
-            json_text = f.read()
-            json_obj = json.loads(json_text)
+        # gzip compressed JSON files are written by the collector with a
+        # `.json.gz` extension
+        opener = gzip.open if json_path.endswith(".gz") else open
+        with opener(json_path, "rb") as f:
+            json_bytes = f.read()
+            json_obj = orjson.loads(json_bytes)
             html_text = json_obj["parse"]["text"]
             content = parse_html_p_content(html_text)
             if content: